@@ -2,36 +2,167 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import datetime
+import functools
+import json
+import operator
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
 
 import dateutil.parser
-import pytz
-import requests
-from lib4package.metadata import Metadata
 from lib4sbom.data.document import SBOMDocument
 from lib4sbom.license import LicenseScanner
 from packageurl import PackageURL
 from rich import print
+from rich.console import Console
 from rich.panel import Panel
+from rich.style import Style
 from rich.text import Text
 
+from sbomaudit.version import VERSION
+
+# Maximum number of concurrent version lookups
+MAX_WORKERS = 32
+# Connect and read timeouts (in seconds) for version lookups
+REQUEST_TIMEOUT = (3.05, 10)
+# Location and lifetime (in seconds) of cached package data
+CACHE_DIR = Path.home() / ".cache" / "sbomaudit"
+PYPI_CACHE_FILE = CACHE_DIR / "pypi.json"
+PACKAGE_CACHE_FILE = CACHE_DIR / "packages.json"
+CACHE_EXPIRY = 6 * 60 * 60
+# Can be two specifications of PACKAGE MANAGER attribute!
+PACKAGE_MANAGER_REFERENCES = frozenset(["PACKAGE-MANAGER", "PACKAGE_MANAGER"])
+CPE_REFERENCES = frozenset(["cpe22Type", "cpe23Type"])
+# Up to date versions of each SBOM specification
+SPDX_VERSIONS = frozenset(["SPDX-2.2", "SPDX-2.3"])
+CYCLONEDX_VERSIONS = frozenset(["1.3", "1.4", "1.5", "1.6"])
+# Package attributes used by the checks
+PACKAGE_FIELDS = operator.itemgetter("id", "name", "version", "supplier", "license")
+# License values which don't identify a license
+NO_LICENSE = frozenset(["NOT KNOWN", "NOASSERTION"])
+
+# Styles of passed and failed check results
+PASS_STYLE = Style(color="green")
+FAIL_STYLE = Style(color="red")
+# Section header within an allow or deny list file
+SECTION_HEADER = re.compile(r"^\[\s*(.*?)\s*\]$")
+# Check messages can be deferred until required
+Message = Union[str, Callable[[], str]]
+# Number of files or packages sent to a worker process at a time
+CHUNK_SIZE = 64
+
+# Audit instance used by a worker process
+_worker_audit = None
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_purl(purl):
+    # Packages frequently share PURLs so only parse each one once
+    package_url = PackageURL.from_string(purl)
+    return package_url.type, package_url.name
+
+
+def _normalise_pypi_name(name):
+    # Normalise name (PEP 503) so that equivalent names are only retrieved once
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _lookup_key(purl_type, name):
+    # Key used to retrieve the latest version of a package
+    if purl_type == "pypi":
+        return purl_type, _normalise_pypi_name(name)
+    return purl_type, name
+
+
+def _parse_date(date):
+    # Release dates are normally ISO 8601 so avoid the general purpose parser
+    try:
+        return datetime.datetime.fromisoformat(date.replace("Z", "+00:00"))
+    except ValueError:
+        return dateutil.parser.parse(date)
+
+
+def _worker_init(options, allow_list, deny_list, license_caches):
+    global _worker_audit
+    _worker_audit = SBOMaudit(options=options)
+    _worker_audit.allow_list = allow_list
+    _worker_audit.deny_list = deny_list
+    (
+        _worker_audit.license_cache,
+        _worker_audit.osi_cache,
+        _worker_audit.deprecated_cache,
+    ) = license_caches
+    _worker_audit._select_checks()
+
+
+def _worker_checks(method, args):
+    # Messages must be resolved before being returned from a worker process
+    checks = []
+    for text, state, failure_text, policy in getattr(_worker_audit, method)(*args):
+        if not state:
+            text = _worker_audit._message(text)
+            failure_text = _worker_audit._message(failure_text)
+        else:
+            text = _worker_audit._message(text) if _worker_audit.verbose else ""
+            failure_text = ""
+        checks.append((text, state, failure_text, policy))
+    return checks
+
 
 class SBOMaudit:
     def __init__(self, options={}, output=""):
-        self.verbose = options.get("verbose", False)
+        self.options = options
         self.offline = options.get("offline", False)
         self.cpe_check = options.get("cpecheck", False)
         self.purl_check = options.get("purlcheck", False)
-        self.license_check = options.get("license_check", True)
+        self.ntia_only = options.get("ntia_only", False)
+        # License checks are not performed if only NTIA conformance is checked
+        self.license_check = options.get("license_check", True) and not self.ntia_only
         self.age = int(options.get("age", "0"))
         self.debug = options.get("debug", False)
+        self.jobs = int(options.get("jobs", "1"))
+        self.use_cache = options.get("cache", True)
+        self.refresh_cache = options.get("refresh_cache", False)
         DAYS_IN_YEAR = 365
         self.maxage = int(options.get("maxage", "2")) * DAYS_IN_YEAR
-        self.license_scanner = LicenseScanner()
-        self.check_count = {"Fail": 0, "Pass": 0}
-        self.policy_check_count = {"Fail": 0, "Pass": 0}
+        self.license_scanner = None
+        self.spdx_licenses = frozenset()
+        if self.license_check:
+            self.license_scanner = LicenseScanner()
+            # Exact SPDX license identifiers don't need to be scanned
+            self.spdx_licenses = frozenset(
+                license["licenseId"]
+                for license in self.license_scanner.get_license_list()
+            )
+        self.license_cache = {}
+        self.osi_cache = {}
+        self.deprecated_cache = {}
+        self.reset()
         self.allow_list = {}
         self.deny_list = {}
+        # Checks are not rendered if the audit is only reported as JSON
+        self.console_out = output == "" and not options.get("json", False)
+        self.console = Console(highlight=False)
+        self.pass_prefix = "[x] "
+        self.fail_prefix = "[ ] "
+        # Only created if versions are retrieved online
+        self.session = None
+        self.pypi_cache = {}
+        self.pypi_expired = {}
+        self.package_cache = {}
+        self.parse_purl = True
+
+    def reset(self):
+        # Clear the results of any previous audit. Caches and the allow and deny
+        # lists are retained so that they can be reused for further SBOMs.
+        self.verbose = self.options.get("verbose", False)
+        self.pass_count = 0
+        self.fail_count = 0
+        self.policy_pass_count = 0
+        self.policy_fail_count = 0
         # Audit data in JSON
         self.audit = {}
         self.package_component = []
@@ -39,117 +170,658 @@ class SBOMaudit:
         self.relationship_component = []
         self.policy_component = []
         self.component = []
-        self.element = {}
-        self.console_out = output == ""
 
     def get_audit(self):
         return self.audit
 
-    def _component_message(self, message, state="Fail", policy=False):
+    @property
+    def check_count(self) -> dict:
+        return {"Fail": self.fail_count, "Pass": self.pass_count}
+
+    @property
+    def policy_check_count(self) -> dict:
+        return {"Fail": self.policy_fail_count, "Pass": self.policy_pass_count}
+
+    def _component_message(
+        self, message: str, state: str = "Fail", policy: bool = False
+    ) -> None:
         element = {"text": message, "state": state}
         if not policy:
-            if len(self.component) > 0:
-                self.component.append(element)
-            else:
-                self.component = [element]
+            self.component.append(element)
         else:
-            if len(self.policy_component) > 0:
-                self.policy_component.append(element)
-            else:
-                self.policy_component = [element]
+            self.policy_component.append(element)
 
-    def _send_to_console(self, text, colour):
+    def _send_to_console(self, prefix: str, text: str, style: Style) -> None:
         if self.console_out:
-            print(Text.styled(text, colour))
+            # Prefix and text share a style so render as a single styled text
+            self.console.print(Text(prefix + text, style=style))
 
-    def _show_text(self, text, policy=False):
-        self._send_to_console(f"[x] {text}", "green")
+    def _show_text(self, text: str, policy: bool = False) -> None:
+        self._send_to_console(self.pass_prefix, text, PASS_STYLE)
         self._component_message(f"{text}", state="Pass", policy=policy)
 
-    def _show_result(self, text, state, value=None, failure_text="MISSING", policy=False):
+    def _message(self, text: Message) -> str:
+        # Messages may be deferred until they are known to be required
+        return text() if callable(text) else text
+
+    def _show_result(
+        self,
+        text: Message,
+        state: object,
+        value: Optional[str] = None,
+        failure_text: Message = "MISSING",
+        policy: bool = False,
+    ) -> None:
         if state:
             # Green
             if self.verbose:
-                self._show_text(text, policy=policy)
+                self._show_text(self._message(text), policy=policy)
             if not policy:
-                self.check_count["Pass"] = self.check_count["Pass"] + 1
+                self.pass_count += 1
             else:
-                self.policy_check_count["Pass"] = self.policy_check_count["Pass"] + 1
+                self.policy_pass_count += 1
         else:
             # Red
+            text = self._message(text)
+            failure_text = self._message(failure_text)
             if value is not None:
-                self._send_to_console(f"[ ] {text}: {value}", "red")
+                self._send_to_console(self.fail_prefix, f"{text}: {value}", FAIL_STYLE)
                 self._component_message(f"{text}: {value}", policy=policy)
             elif len(failure_text) > 0:
-                self._send_to_console(f"[ ] {text}: {failure_text}", "red")
+                self._send_to_console(self.fail_prefix, f"{text}: {failure_text}", FAIL_STYLE)
                 self._component_message(f"{text}: {failure_text}", policy=policy)
             else:
-                self._send_to_console(f"[ ] {text}", "red")
+                self._send_to_console(self.fail_prefix, text, FAIL_STYLE)
                 self._component_message(f"{text}", policy=policy)
             if not policy:
-                self.check_count["Fail"] = self.check_count["Fail"] + 1
+                self.fail_count += 1
             else:
-                self.policy_check_count["Fail"] = self.policy_check_count["Fail"] + 1
+                self.policy_fail_count += 1
 
     def _heading(self, title):
         if self.console_out:
-            print(Panel(title, style="bold", expand=False))
+            self.console.print(Panel(title, style="bold", expand=False))
 
-    def _check_value(self, text, values, data_item):
+    def _check_value(
+        self, text: Message, values: frozenset, data_item: Optional[str]
+    ) -> None:
         self._show_result(text, data_item in values, data_item)
 
-    def _check(self, text, value, failure_text="MISSING", policy=False):
+    def _check(
+        self,
+        text: Message,
+        value: object,
+        failure_text: Message = "MISSING",
+        policy: bool = False,
+    ) -> None:
         self._show_result(text, value, failure_text=failure_text, policy=policy)
 
+    def _add_element(self, components: list, element: dict) -> None:
+        # Record any reports for the file or package
+        if len(self.component) > 0:
+            element["reports"] = self.component
+            components.append(element)
+            self.component = []
+
+    def _spdx_license(self, license: Optional[str]) -> bool:
+        if license in self.spdx_licenses:
+            return True
+        # Licenses are frequently repeated so only scan each license once
+        if license not in self.license_cache:
+            self.license_cache[license] = self.license_scanner.find_license(
+                license
+            ) not in {"UNKNOWN", "NOASSERTION"}
+        return self.license_cache[license]
+
+    def _osi_approved(self, license):
+        if license not in self.osi_cache:
+            self.osi_cache[license] = self.license_scanner.osi_approved(license)
+        return self.osi_cache[license]
+
+    def _deprecated_license(self, license):
+        if license not in self.deprecated_cache:
+            self.deprecated_cache[license] = self.license_scanner.deprecated(license)
+        return self.deprecated_cache[license]
+
+    def _scan_licenses(self, licenses):
+        # Scan each distinct license once before the checks are performed so that
+        # the results can also be shared with any worker processes
+        for license in licenses:
+            if isinstance(license, str):
+                self._spdx_license(license)
+                self._osi_approved(license)
+                self._deprecated_license(license)
+
+    def _read_cache(self, filename):
+        try:
+            with open(filename, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict):
+            return {}
+        # Ignore any entries which are not valid
+        return {key: data for key, data in cache.items() if isinstance(data, dict)}
+
+    def _write_cache(self, filename, cache):
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(filename, "w") as f:
+                json.dump(cache, f)
+        except OSError as error:
+            if self.debug:
+                print(f"Unable to save cache {filename}. {error}")
+
+    def _load_cache(self):
+        # Load previously retrieved package data which has not expired. If operating
+        # offline, any previously retrieved data is used. Expired PyPI data is
+        # retained so that it can be revalidated and is not lost from the cache.
+        if not self.use_cache or self.refresh_cache:
+            return
+        now = time.time()
+        for name, data in self._read_cache(PYPI_CACHE_FILE).items():
+            if self.offline or now - data.get("timestamp", 0) < CACHE_EXPIRY:
+                self.pypi_cache.setdefault(name, data)
+            else:
+                self.pypi_expired[name] = data
+        for key, data in self._read_cache(PACKAGE_CACHE_FILE).items():
+            if self.offline or now - data.get("timestamp", 0) < CACHE_EXPIRY:
+                self.package_cache.setdefault(key, data)
+
+    def _save_cache(self):
+        if not self.use_cache:
+            return
+        # Only retain successful lookups. Expired data is kept unless replaced
+        cache = dict(self.pypi_expired)
+        cache.update((name, data) for name, data in self.pypi_cache.items() if data)
+        self._write_cache(PYPI_CACHE_FILE, cache)
+        self._write_cache(PACKAGE_CACHE_FILE, self.package_cache)
+
+    def _get_session(self):
+        if self.session is None:
+            # Only imported if versions are retrieved online
+            import requests
+            from requests.adapters import HTTPAdapter, Retry
+
+            # Share connections across concurrent version lookups
+            self.session = requests.Session()
+            self.session.headers.update(
+                {"Accept": "application/json", "User-Agent": f"sbomaudit/{VERSION}"}
+            )
+            self.session.mount(
+                "https://",
+                HTTPAdapter(
+                    pool_maxsize=MAX_WORKERS,
+                    max_retries=Retry(total=2, backoff_factor=0.3),
+                ),
+            )
+        return self.session
+
+    def _close_session(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def _get_pypi_data(self, name):
+        name = _normalise_pypi_name(name)
+        if name in self.pypi_cache:
+            return self.pypi_cache[name]
+        elif self.offline:
+            return None
+        url = f"https://pypi.org/pypi/{name}/json"
+        data = None
+        headers = {}
+        expired = self.pypi_expired.get(name)
+        if expired is not None and expired.get("etag"):
+            # Expired data is reused if the package has not changed
+            headers["If-None-Match"] = expired["etag"]
+        try:
+            response = self._get_session().get(
+                url, headers=headers, timeout=REQUEST_TIMEOUT
+            )
+            if response.status_code == 304 and expired is not None:
+                data = dict(expired, timestamp=time.time())
+            else:
+                response.raise_for_status()
+                package_json = response.json()
+                # Only retain the data required for the audit
+                releases = {}
+                for release, release_files in package_json["releases"].items():
+                    if len(release_files) > 0:
+                        releases[release] = release_files[0]["upload_time_iso_8601"]
+                data = {
+                    "version": package_json["info"]["version"],
+                    "releases": releases,
+                    "timestamp": time.time(),
+                    "etag": response.headers.get("ETag"),
+                }
+        except Exception as error:
+            if self.debug:
+                print(f"Unable to retrieve Python data for {name}. {error}")
+            # Fall back to any expired data
+            data = expired
+        self.pypi_cache[name] = data
+        return data
+
     def find_latest_version(self, name, version=None):
         """Returns the version and release date of the package available at PyPI."""
 
-        url: str = f"https://pypi.org/pypi/{name}/json"
         pypi_version = None
         pypi_date = None
-        try:
-            package_json = requests.get(url).json()
+        data = self._get_pypi_data(name)
+        if data is not None:
             if version is None:
-                pypi_version = package_json["info"]["version"]
+                pypi_version = data["version"]
             else:
                 pypi_version = version
-            pypi_date = package_json["releases"][pypi_version][0][
-                "upload_time_iso_8601"
-            ]
+            pypi_date = data["releases"].get(pypi_version)
+        return pypi_version, pypi_date
+
+    def _lookup_package(self, package):
+        purl_type, name = package
+        if purl_type == "pypi":
+            return self._get_pypi_data(name)
+        key = f"{purl_type}:{name}"
+        if key in self.package_cache:
+            data = self.package_cache[key]
+            return data["version"], data["date"]
+        try:
+            latest_version, latest_date = self.get_package_info(name, purl_type)
         except Exception as error:
+            # Only the version checks for this package are lost
             if self.debug:
-                print(f"Unable to retrieve Python data for {name} - {version}. {error}")
-        return pypi_version, pypi_date
+                print(f"Unable to retrieve {purl_type} data for {name}. {error}")
+            return None, None
+        if latest_version is not None:
+            self.package_cache[key] = {
+                "version": latest_version,
+                "date": latest_date,
+                "timestamp": time.time(),
+            }
+        return latest_version, latest_date
+
+    def _get_latest_version(self, package, lookups):
+        purl_type, name, version = package
+        if purl_type == "pypi":
+            # Latest version and release date are taken from the same PyPI data
+            data = lookups[_lookup_key(purl_type, name)]
+            if data is None:
+                return None, None
+            release = version if version is not None else data["version"]
+            return data["version"], data["releases"].get(release)
+        return lookups[(purl_type, name)]
+
+    def _get_latest_versions(self, packages):
+        packages = list(packages)
+        if len(packages) == 0:
+            return {}
+        # Each package is only retrieved once, even if multiple versions are used.
+        # Lookups are network bound so run concurrently
+        distinct = list({_lookup_key(purl_type, name) for purl_type, name, _ in packages})
+        if not self.offline:
+            # Session is shared by all of the lookups
+            self._get_session()
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            lookups = dict(zip(distinct, executor.map(self._lookup_package, distinct)))
+        # All of the required data has now been retrieved
+        self._close_session()
+        if not self.offline:
+            self._save_cache()
+        return {package: self._get_latest_version(package, lookups) for package in packages}
 
     def get_package_info(self, package_name, package_type):
-        self.package_metadata = Metadata(package_type, debug=self.debug)
-        self.package_metadata.get_package(package_name)
-        latest_version = self.package_metadata.get_latest_version()
-        latest_date = self.package_metadata.get_latest_release_time()
+        from lib4package.metadata import Metadata
+
+        # Metadata is per call as lookups may run concurrently
+        package_metadata = Metadata(package_type, debug=self.debug)
+        package_metadata.get_package(package_name)
+        latest_version = package_metadata.get_latest_version()
+        latest_date = package_metadata.get_latest_release_time()
+        return latest_version, latest_date
+
+    def _version_key(self, details):
+        # Key used to look up the latest version of a package
+        if details["id"] is None or details["name"] is None:
+            return None
+        purl_type = details["purl_type"]
+        if purl_type == "pypi":
+            return (purl_type, details["name"], details["version"])
+        if purl_type is not None and (
+            not self.offline or f"{purl_type}:{details['name']}" in self.package_cache
+        ):
+            return (purl_type, details["name"], None)
+        return None
+
+    def _package_details(self, package):
+        # Extract the package attributes required for the audit
+        details = {
+            "id": package.get("id", None),
+            "name": package.get("name", None),
+            "version": package.get("version", None),
+            "supplier": package.get("supplier", None),
+            "license": package.get("licenseconcluded", "NOT KNOWN"),
+            "purl_type": None,
+            "purl_name": None,
+            "purl_used": False,
+            "cpe_used": False,
+        }
+        external_refs = package.get("externalreference", None)
+        if external_refs is not None:
+            (
+                details["purl_type"],
+                details["purl_name"],
+                details["purl_used"],
+                details["cpe_used"],
+            ) = self._classify_refs(external_refs)
+        return details
+
+    def _file_compliant(self, file) -> bool:
+        # Minimum elements are ID, Name
+        return file.get("id", None) is not None and file.get("name", None) is not None
+
+    def _package_compliant(self, package) -> bool:
+        # Minimum elements are ID, Name, Version, Supplier
+        return (
+            package.get("id", None) is not None
+            and package.get("name", None) is not None
+            and package.get("version", None) is not None
+            and package.get("supplier", None) not in {None, "NOASSERTION"}
+        )
+
+    def _classify_refs(self, external_refs):
+        # Returns the PURL type and name, and whether a PURL or CPE is specified
+        purl_type = None
+        purl_name = None
+        purl_used = False
+        cpe_used = False
+        for external_ref in external_refs:
+            if external_ref[0] in PACKAGE_MANAGER_REFERENCES:
+                purl_used = True
+                if not self.parse_purl:
+                    continue
+                try:
+                    purl_type, purl_name = _parse_purl(external_ref[2])
+                except ValueError:
+                    purl_used = False
+            elif external_ref[1] in CPE_REFERENCES:
+                cpe_used = True
+        return purl_type, purl_name, purl_used, cpe_used
+
+    def _license_id_checks(self, name, license, entity):
+        yield (
+            lambda: f"SPDX Compatible License id included for {entity}{name}",
+            self._spdx_license(license),
+            lambda: f"{license}",
+            False,
+        )
+        yield (
+            lambda: f"OSI Approved license for {name}",
+            self._osi_approved(license),
+            "MISSING",
+            False,
+        )
+        yield (
+            lambda: f"Non-deprecated license for {name}",
+            not self._deprecated_license(license),
+            "MISSING",
+            False,
+        )
+
+    def _known_license_id_checks(self, name, license, entity):
+        if license not in NO_LICENSE:
+            yield from self._license_id_checks(name, license, entity)
+
+    def _allowed_license_check(self, allow_licenses, name, license, entity):
+        yield (
+            lambda: f"Allowed License check for {entity}{name}",
+            license in allow_licenses,
+            lambda: f"{license} not allowed",
+            True,
+        )
+
+    def _denied_license_check(self, deny_licenses, name, license, entity):
+        yield (
+            lambda: f"Denied License check for {entity}{name}",
+            not (license in deny_licenses),
+            lambda: f"{license} not allowed",
+            True,
+        )
+
+    def _allowed_package_check(self, allow_packages, name):
+        yield (
+            lambda: f"Allowed Package check for package {name}",
+            name in allow_packages,
+            lambda: f"{name} not allowed",
+            True,
+        )
+
+    def _denied_package_check(self, deny_packages, name):
+        yield (
+            lambda: f"Denied Package check for package {name}",
+            not (name in deny_packages),
+            lambda: f"{name} not allowed",
+            True,
+        )
+
+    def _cpe_check(self, name, details):
+        yield (
+            lambda: f"CPE name included for package {name}",
+            details["cpe_used"],
+            "MISSING",
+            False,
+        )
+
+    def _purl_checks(self, name, details):
+        yield (
+            lambda: f"PURL included for package {name}",
+            details["purl_used"],
+            "MISSING or INVALID",
+            False,
+        )
+        if details["purl_used"]:
+            # Check name is consistent with package name
+            yield (
+                lambda: f"PURL name compatible with package {name}",
+                details["purl_name"] == name,
+                "MISSING",
+                False,
+            )
+
+    def _select_checks(self):
+        # The optional checks don't change during an audit so determine them once
+        self.now = datetime.datetime.now(datetime.timezone.utc)
+        self.file_license_checks = []
+        self.package_license_checks = []
+        self.package_policy_checks = []
+        self.package_reference_checks = []
+        if self.license_check:
+            self.file_license_checks.append(self._license_id_checks)
+            self.package_license_checks.append(self._known_license_id_checks)
+        allow_licenses = self.allow_list.get("license", None)
+        if allow_licenses is not None:
+            check = functools.partial(self._allowed_license_check, allow_licenses)
+            self.file_license_checks.append(check)
+            self.package_license_checks.append(check)
+        deny_licenses = self.deny_list.get("license", None)
+        if deny_licenses is not None:
+            check = functools.partial(self._denied_license_check, deny_licenses)
+            self.file_license_checks.append(check)
+            self.package_license_checks.append(check)
+        allow_packages = self.allow_list.get("package", None)
+        if allow_packages is not None:
+            self.package_policy_checks.append(
+                functools.partial(self._allowed_package_check, allow_packages)
+            )
+        deny_packages = self.deny_list.get("package", None)
+        if deny_packages is not None:
+            self.package_policy_checks.append(
+                functools.partial(self._denied_package_check, deny_packages)
+            )
+        if self.cpe_check:
+            self.package_reference_checks.append(self._cpe_check)
+        if self.purl_check:
+            self.package_reference_checks.append(self._purl_checks)
+
+    def _file_checks(self, file: dict) -> Iterator[tuple]:
+        # Generates (text, state, failure_text, policy) for each check of a file.
+        # Minimum elements are ID, Name
+        id: Optional[str] = file.get("id", None)
+        if id is None:
+            yield ("File id missing", False, "MISSING", False)
+            return
+        name = file.get("name", None)
+        filetype = file.get("filetype", None)
+        license = file.get("licenseconcluded", None)
+        copyright = file.get("copyrighttext", None)
+        yield (lambda: f"File name specified - {name}", name, "MISSING", False)
+        # Use file id to identify file if name not specified
+        label = name if name is not None else id
+        # File types are only joined if they are to be reported
+        if filetype is not None:
+            yield (
+                lambda: f"File type identified - {label} : {', '.join(filetype)}",
+                True,
+                "MISSING",
+                False,
+            )
+        else:
+            yield (f"File type identified - {label} : None", False, "MISSING", False)
+        yield (
+            lambda: f"License specified - {label} : {license}",
+            license not in {None, "NOASSERTION"},
+            "",
+            False,
+        )
+        for check in self.file_license_checks:
+            yield from check(label, license, "")
+        yield (
+            lambda: f"Copyright defined - {label} : {copyright}",
+            copyright not in {None, "NOASSERTION"},
+            "",
+            False,
+        )
+
+    def _latest_version(self, details, latest_versions):
+        # Returns the latest version and release date of the package
+        latest_version = None
+        latest_date = None
+        name = details["name"]
+        purl_type = details["purl_type"]
+        if details["id"] is not None and name is not None and purl_type is not None:
+            latest_version, latest_date = latest_versions.get(
+                self._version_key(details), (None, None)
+            )
+            if self.debug:
+                print(
+                    f"Version check for {name} within {purl_type} ecosystem. "
+                    f"{latest_version} {latest_date}"
+                )
         return latest_version, latest_date
 
+    def _package_checks(
+        self, details: dict, latest_version: Optional[str], latest_date: Optional[str]
+    ) -> Iterator[tuple]:
+        # Generates (text, state, failure_text, policy) for each check of a package.
+        # Minimum elements are ID, Name, Version, Supplier
+        id: Optional[str]
+        id, name, version, supplier, license = PACKAGE_FIELDS(details)
+        if id is None:
+            yield ("Package id missing", False, "MISSING", False)
+            return
+        if name is None:
+            yield (lambda: f"Package name missing for {id}", False, "MISSING", False)
+            return
+        for check in self.package_policy_checks:
+            yield from check(name)
+        yield (
+            lambda: f"Supplier included for package {name}",
+            supplier,
+            "MISSING",
+            False,
+        )
+        yield (lambda: f"Version included for package {name}", version, "MISSING", False)
+        yield (
+            lambda: f"License included for package {name}",
+            license not in NO_LICENSE,
+            "MISSING",
+            False,
+        )
+        for check in self.package_license_checks:
+            yield from check(name, license, "package ")
+        if latest_version is not None:
+            yield (
+                lambda: f"Using latest version of package {name}",
+                latest_version == version,
+                lambda: f"Version is {version}; latest is {latest_version}",
+                False,
+            )
+        if latest_date is not None:
+            release_age = self.now - _parse_date(latest_date)
+            yield (
+                lambda: f"Using mature version of package {name}",
+                release_age.days > self.age,
+                lambda: f"Age of release is {release_age.days} days",
+                True,
+            )
+            # Check age of release if not using the latest version
+            if latest_version is not None and latest_version != version:
+                yield (
+                    lambda: f"Using old version of package {name}",
+                    release_age.days < self.maxage,
+                    lambda: f"Age of release is {release_age.days} days",
+                    True,
+                )
+        for check in self.package_reference_checks:
+            yield from check(name, details)
+
+    def _entity_checks(self, method, entities):
+        # Returns the checks for each entity, using worker processes if requested
+        if self.jobs > 1 and len(entities) > CHUNK_SIZE:
+            with ProcessPoolExecutor(
+                max_workers=self.jobs,
+                initializer=_worker_init,
+                initargs=(
+                    self.options,
+                    self.allow_list,
+                    self.deny_list,
+                    (self.license_cache, self.osi_cache, self.deprecated_cache),
+                ),
+            ) as executor:
+                return list(
+                    executor.map(
+                        _worker_checks,
+                        [method] * len(entities),
+                        entities,
+                        chunksize=CHUNK_SIZE,
+                    )
+                )
+        return (getattr(self, method)(*entity) for entity in entities)
+
     def process_file(self, filename, allow):
         # Only process if file exists
-        if Path(filename).resolve().exists():
-            if allow:
-                self._setup(filename, self.allow_list)
-            else:
-                self._setup(filename, self.deny_list)
+        if os.path.isfile(filename):
+            self._setup(filename, self.allow_list if allow else self.deny_list)
 
     def _setup(self, filename, data_list):
+        sections = {}
         with open(filename, "r") as f:
-            lines = f.readlines()
-            for line in lines:
-                if line.startswith("#"):
-                    # Comment so ignore
+            section = None
+            for line in f:
+                line = line.strip()
+                if len(line) == 0 or line.startswith("#"):
+                    # Blank line or comment so ignore
                     continue
-                elif line.startswith("["):
-                    type = line.replace("[", "").replace("]", "").strip()
-                    data_list[type] = []
-                else:
-                    data_list[type].append(line.strip())
+                header = SECTION_HEADER.match(line)
+                if header is not None:
+                    section = header.group(1)
+                    sections[section] = set()
+                elif section is not None:
+                    sections[section].add(line)
+        # Lists are not modified during the audit
+        for section, entries in sections.items():
+            data_list[section] = frozenset(entries)
 
-    def audit_sbom(self, sbom_parser):
+    def audit_sbom(self, sbom_parser) -> bool:
         # Get constituent components of the SBOM
         packages = sbom_parser.get_packages()
         files = sbom_parser.get_files()
@@ -158,7 +830,7 @@ class SBOMaudit:
         document.copy_document(sbom_parser.get_document())
 
         self._heading("SBOM Format Summary")
-        fail_count = self.check_count["Fail"]
+        fail_count = self.fail_count
 
         self.component = []
 
@@ -168,13 +840,13 @@ class SBOMaudit:
             if document.get_type().lower() == "spdx":
                 self._check_value(
                     "Up to date SPDX Version",
-                    ["SPDX-2.2", "SPDX-2.3"],
+                    SPDX_VERSIONS,
                     document.get_version(),
                 )
             else:
                 self._check_value(
                     "Up to date CycloneDX Version",
-                    ["1.3", "1.4", "1.5", "1.6"],
+                    CYCLONEDX_VERSIONS,
                     document.get_version(),
                 )
             creation_time = document.get_created() is not None
@@ -189,144 +861,62 @@ class SBOMaudit:
             relationships_valid = False
         # Report if all checks passed
         if not self.verbose:
-            if self.check_count["Fail"] == fail_count:
+            if self.fail_count == fail_count:
                 # No tests failed
                 self._show_text("Valid SBOM Format")
 
         self.audit["metadata"] = self.component
         self.component = []
 
+        if self.ntia_only:
+            # Only the minimum elements required for NTIA conformance are checked
+            return self._ntia_summary(
+                creator_identified
+                and creation_time
+                and relationships_valid
+                and all(map(self._file_compliant, files))
+                and all(map(self._package_compliant, packages))
+            )
+
         files_valid = True
         packages_valid = True
 
-        allow_licenses = self.allow_list.get("license", None)
-        deny_licenses = self.deny_list.get("license", None)
-        allow_packages = self.allow_list.get("package", None)
-        deny_packages = self.deny_list.get("package", None)
+        self._select_checks()
+        if self.license_check:
+            self._scan_licenses(
+                {
+                    file.get("licenseconcluded", None)
+                    for file in files
+                    if file.get("id", None) is not None
+                }
+                | {
+                    package.get("licenseconcluded", "NOT KNOWN")
+                    for package in packages
+                    if package.get("id", None) is not None
+                }
+                - NO_LICENSE
+            )
 
         if len(files) > 0:
             self._heading("File Summary")
-            fail_count = self.check_count["Fail"]
-            for file in files:
-                # Minimum elements are ID, Name
-                id = file.get("id", None)
-                if id is None:
-                    self._check("File id missing", id)
-                else:
-                    name = file.get("name", None)
-                    filetype = file.get("filetype", None)
-                    if filetype is not None:
-                        file_type = ", ".join(t for t in filetype)
-                    else:
-                        file_type = None
-                    license = file.get("licenseconcluded", None)
-                    spdx_license = self.license_scanner.find_license(license) not in [
-                        "UNKNOWN",
-                        "NOASSERTION",
-                    ]
-                    copyright = file.get("copyrighttext", None)
-                    self._check(f"File name specified - {name}", name)
-                    if name is not None:
-                        self._check(
-                            f"File type identified - {name} : {file_type}",
-                            filetype is not None,
-                        )
-                        self._check(
-                            f"License specified - {name} : {license}",
-                            not (license in [None, "NOASSERTION"]),
-                            failure_text="",
-                        )
-                        if self.license_check:
-                            self._check(
-                                f"SPDX Compatible License id included for {name}",
-                                spdx_license,
-                                failure_text=f"{license}",
-                            )
-                            self._check(
-                                f"OSI Approved license for {name}",
-                                self.license_scanner.osi_approved(license),
-                            )
-                            self._check(
-                                f"Non-deprecated license for {name}",
-                                not self.license_scanner.deprecated(license),
-                            )
-                        if allow_licenses is not None:
-                            self._check(
-                                f"Allowed License check for {name}",
-                                license in allow_licenses,
-                                failure_text=f"{license} not allowed",
-                                policy = True,
-                            )
-                        if deny_licenses is not None:
-                            self._check(
-                                f"Denied License check for {name}",
-                                not (license in deny_licenses),
-                                failure_text=f"{license} not allowed",
-                                policy=True,
-                            )
-                        self._check(
-                            f"Copyright defined - {name} : {copyright}",
-                            not (copyright in [None, "NOASSERTION"]),
-                            failure_text="",
-                        )
-                    else:
-                        self._check(
-                            f"File type identified - {id} : {file_type}",
-                            filetype is not None,
-                        )
-                        self._check(
-                            f"License specified - {id} : {license}",
-                            not (license in [None, "NOASSERTION"]),
-                            failure_text="",
-                        )
-                        if self.license_check:
-                            self._check(
-                                f"SPDX Compatible License id included for {id}",
-                                spdx_license,
-                                failure_text=f"{license}",
-                            )
-                            self._check(
-                                f"OSI Approved license for {id}",
-                                self.license_scanner.osi_approved(license),
-                            )
-                            self._check(
-                                f"Non-deprecated license for {name}",
-                                not self.license_scanner.deprecated(license),
-                            )
-                        if allow_licenses is not None:
-                            self._check(
-                                f"Allowed License check for {id}",
-                                license in allow_licenses,
-                                failure_text=f"{license} not allowed",
-                                policy = True,
-                            )
-                        if deny_licenses is not None:
-                            self._check(
-                                f"Denied License check for {id}",
-                                not (license in deny_licenses),
-                                failure_text=f"{license} not allowed",
-                                policy=True,
-                            )
-                        self._check(
-                            f"Copyright defined - {id} : {copyright}",
-                            not (copyright in [None, "NOASSERTION"]),
-                            failure_text="",
-                        )
-                if len(self.component) > 0:
-                    self.element["name"] = name
-                    self.element["id"] = id
-                    self.element["reports"] = self.component
-                    self.file_component.append(self.element)
-                    self.element = {}
-                    self.component = []
-
-                if id is None or name is None:
-                    files_valid = False
+            fail_count = self.fail_count
+            file_checks = self._entity_checks("_file_checks", [(file,) for file in files])
+            # Buffer the console output for the checks
+            with self.console:
+                for file, checks in zip(files, file_checks):
+                    for check in checks:
+                        self._check(*check)
+                    id = file.get("id", None)
+                    name = file.get("name", None) if id is not None else None
+                    self._add_element(self.file_component, {"name": name, "id": id})
+
+                    if not self._file_compliant(file):
+                        files_valid = False
             self._check("NTIA compliant", files_valid, failure_text="FAILED")
 
             # Report if all checks passed
             if not self.verbose:
-                if self.check_count["Fail"] == fail_count:
+                if self.fail_count == fail_count:
                     # No tests failed
                     self._show_text("File Summary")
 
@@ -335,192 +925,51 @@ class SBOMaudit:
 
         if len(packages) > 0:
             self._heading("Package Summary")
-            fail_count = self.check_count["Fail"]
-            for package in packages:
-                # Minimum elements are ID, Name, Version, Supplier
-                id = package.get("id", None)
-                name = None
-                version = None
-                supplier = None
-                if id is None:
-                    self._check("Package id missing", id)
-                else:
-                    # Get package metadata
-                    name = package.get("name", None)
-                    version = package.get("version", None)
-                    supplier = package.get("supplier", None)
-                    license = package.get("licenseconcluded", "NOT KNOWN")
-                    spdx_license = self.license_scanner.find_license(license) not in [
-                        "UNKNOWN",
-                        "NOASSERTION",
-                    ]
-                    # Check if package is the latest version
-                    external_refs = package.get("externalreference", None)
-                    latest_version = None
-                    latest_date = None
-                    purl_used = False
-                    cpe_used = False
-                    if external_refs is not None:
-                        for external_ref in external_refs:
-                            # Can be two specifications of PACKAGE MANAGER attribute!
-                            if external_ref[0] in [
-                                "PACKAGE-MANAGER",
-                                "PACKAGE_MANAGER",
-                            ]:
-                                purl_used = True
-                                try:
-                                    purl = PackageURL.from_string(
-                                        external_ref[2]
-                                    ).to_dict()
-                                    if not self.offline:
-                                        if purl["type"] == "pypi":
-                                            # Python package detected
-                                            (
-                                                latest_version,
-                                                _,
-                                            ) = self.find_latest_version(name)
-                                            _, latest_date = self.find_latest_version(
-                                                name, version=version
-                                            )
-                                        else:
-                                            (
-                                                latest_version,
-                                                latest_date,
-                                            ) = self.get_package_info(
-                                                name, purl["type"]
-                                            )
-                                    purl_name = purl["name"]
-                                except ValueError:
-                                    purl_used = False
-                                if self.debug:
-                                    print(
-                                        f"Version check for {name} within {purl['type']} ecosystem. {latest_version} {latest_date}"
-                                    )
-                            elif external_ref[1] in ["cpe22Type", "cpe23Type"]:
-                                cpe_used = True
-
-                    # Now summarise
-                    if name is not None:
-                        if allow_packages is not None:
-                            self._check(
-                                f"Allowed Package check for package {name}",
-                                name in allow_packages,
-                                failure_text=f"{name} not allowed",
-                                policy=True,
-                            )
-                        if deny_packages is not None:
-                            self._check(
-                                f"Denied Package check for package {name}",
-                                not (name in deny_packages),
-                                failure_text=f"{name} not allowed",
-                                policy=True,
-                            )
-                        self._check(f"Supplier included for package {name}", supplier)
-                        self._check(f"Version included for package {name}", version)
-                        self._check(
-                            f"License included for package {name}",
-                            not (license in ["NOT KNOWN", "NOASSERTION"]),
-                        )
-                        if self.license_check and license not in [
-                            "NOT KNOWN",
-                            "NOASSERTION",
-                        ]:
-                            self._check(
-                                f"SPDX Compatible License id included for package {name}",
-                                spdx_license,
-                                failure_text=f"{license}",
-                            )
-                            self._check(
-                                f"OSI Approved license for {name}",
-                                self.license_scanner.osi_approved(license),
-                            )
-                            self._check(
-                                f"Non-deprecated license for {name}",
-                                not self.license_scanner.deprecated(license),
-                            )
-                        if allow_licenses is not None:
-                            self._check(
-                                f"Allowed License check for package {name}",
-                                license in allow_licenses,
-                                failure_text=f"{license} not allowed",
-                                policy=True,
-                            )
-                        if deny_licenses is not None:
-                            self._check(
-                                f"Denied License check for package {name}",
-                                not (license in deny_licenses),
-                                failure_text=f"{license} not allowed",
-                                policy=True,
-                            )
-                        if latest_version is not None:
-                            report = f"Version is {version}; latest is {latest_version}"
-                            self._check(
-                                f"Using latest version of package {name}",
-                                latest_version == version,
-                                failure_text=report,
-                            )
-                        if latest_date is not None:
-                            release_date = dateutil.parser.parse(latest_date)
-                            release_age = (
-                                pytz.utc.localize(datetime.datetime.utcnow())
-                                - release_date
-                            )
-
-                            report = f"Age of release is {release_age.days} days"
-                            self._check(
-                                f"Using mature version of package {name}",
-                                release_age.days > self.age,
-                                failure_text=report,
-                                policy=True,
-                            )
-                            # Check age of release if not using the latest version
-                            if latest_version is not None and latest_version != version:
-                                self._check(
-                                    f"Using old version of package {name}",
-                                    release_age.days < self.maxage,
-                                    failure_text=report,
-                                    policy=True,
-                                )
-                        if self.cpe_check:
-                            self._check(
-                                f"CPE name included for package {name}", cpe_used
-                            )
-                        if self.purl_check:
-                            self._check(
-                                f"PURL included for package {name}",
-                                purl_used,
-                                failure_text="MISSING or INVALID",
-                            )
-                            if purl_used:
-                                # Check name is consistent with package name
-                                self._check(
-                                    f"PURL name compatible with package {name}",
-                                    purl_name == name,
-                                )
-                    else:
-                        self._check(f"Package name missing for {id}", False)
-
-                if len(self.component) > 0:
-                    self.element["name"] = name
-                    self.element["version"] = version
-                    self.element["reports"] = self.component
-                    self.package_component.append(self.element)
-                    self.element = {}
-                    self.component = []
-
-                if (
-                    id is None
-                    or name is None
-                    or version is None
-                    or supplier is None
-                    or supplier == "NOASSERTION"
-                ):
-                    packages_valid = False
+            fail_count = self.fail_count
+            self._load_cache()
+            # PURL only needs to be parsed if version or PURL checks are performed
+            self.parse_purl = (
+                not self.offline
+                or len(self.pypi_cache) > 0
+                or len(self.package_cache) > 0
+                or self.purl_check
+                or self.debug
+            )
+            # Extract package details first so that versions can be retrieved in bulk
+            package_details = [self._package_details(package) for package in packages]
+            latest_versions = self._get_latest_versions(
+                {
+                    key
+                    for key in map(self._version_key, package_details)
+                    if key is not None
+                }
+            )
+            package_checks = self._entity_checks(
+                "_package_checks",
+                [
+                    (details, *self._latest_version(details, latest_versions))
+                    for details in package_details
+                ],
+            )
+            with self.console:
+                for details, checks in zip(package_details, package_checks):
+                    for check in checks:
+                        self._check(*check)
+                    id, name, version, _, _ = PACKAGE_FIELDS(details)
+                    if id is None:
+                        name = version = None
+
+                    self._add_element(
+                        self.package_component, {"name": name, "version": version}
+                    )
+
+                    if not self._package_compliant(details):
+                        packages_valid = False
             self._check("NTIA compliant", packages_valid, failure_text="FAILED")
 
             # Report if all checks passed
             if not self.verbose:
-                if self.check_count["Fail"] == fail_count:
+                if self.fail_count == fail_count:
                     # No tests failed
                     self._show_text("Package Summary")
 
@@ -530,68 +979,62 @@ class SBOMaudit:
         self.audit["policy"] = self.policy_component
 
         self._heading("Relationships Summary")
-        fail_count = self.check_count["Fail"]
+        fail_count = self.fail_count
 
         self._check(
             "Dependency relationships provided for NTIA compliance", relationships_valid
         )
 
         # Check all files/packages included in at least one relationship
-        if len(files) > 0:
-            for file in files:
-                name = file.get("name", None)
-                dep_check = False
-                if name is not None:
-                    for r in relationships:
-                        if name in [r.get("source"), r.get("target")]:
-                            dep_check = True
-                            break
-                self._check(f"Dependency relationship found for {name}", dep_check)
-        if len(packages) > 0:
-            for package in packages:
-                name = package.get("name", None)
-                dep_check = False
-                if name is not None:
-                    for r in relationships:
-                        if name in [r.get("source"), r.get("target")]:
-                            dep_check = True
-                            break
-                self._check(f"Dependency relationship found for {name}", dep_check)
+        names = [file.get("name", None) for file in files] + [
+            package.get("name", None) for package in packages
+        ]
+        related = {
+            name for r in relationships for name in (r.get("source"), r.get("target"))
+        }
+        with self.console:
+            for name in names:
+                self._check(
+                    lambda: f"Dependency relationship found for {name}",
+                    name is not None and name in related,
+                )
 
         # Report if all checks passed
         if not self.verbose:
-            if self.check_count["Fail"] == fail_count:
+            if self.fail_count == fail_count:
                 # No tests failed
                 self._show_text("Relationships Summary")
 
         self.audit["relationships"] = self.component
         self.component = []
 
-        self._heading("NTIA Summary")
-        fail_count = self.check_count["Fail"]
-
-        valid_sbom = (
+        return self._ntia_summary(
             files_valid
             and packages_valid
             and creator_identified
             and creation_time
             and relationships_valid
         )
+
+    def _ntia_summary(self, valid_sbom: bool) -> bool:
+        self._heading("NTIA Summary")
+        fail_count = self.fail_count
+
         self._check("NTIA conformant", valid_sbom, failure_text="FAILED")
 
         # Report if all checks passed
         if not self.verbose:
-            if self.check_count["Fail"] == fail_count:
+            if self.fail_count == fail_count:
                 # No tests failed
                 self._show_text("NTIA Summary")
 
         self._heading("SBOM Audit Summary")
         # Overide verbose setting to ensure always shown
         self.verbose = True
-        self._show_text(f"Checks passed {self.check_count['Pass']}")
-        self._show_text(f"Checks failed {self.check_count['Fail']}")
-        self._show_text(f"Policy checks passed {self.policy_check_count['Pass']}")
-        self._show_text(f"Policy checks failed {self.policy_check_count['Fail']}")
+        self._show_text(f"Checks passed {self.pass_count}")
+        self._show_text(f"Checks failed {self.fail_count}")
+        self._show_text(f"Policy checks passed {self.policy_pass_count}")
+        self._show_text(f"Policy checks failed {self.policy_fail_count}")
         self.audit["summary"] = self.component
 
         return valid_sbom
@@ -2,21 +2,65 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import functools
+import glob
+import json
+import os
 import sys
 import textwrap
-from collections import ChainMap
 
-from lib4sbom.output import SBOMOutput
-from lib4sbom.parser import SBOMParser
-
-from sbomaudit.audit import SBOMaudit
 from sbomaudit.version import VERSION
 
+# Filename extensions of SBOMs which are audited within a directory
+SBOM_EXTENSIONS = (
+    ".spdx",
+    ".spdx.json",
+    ".spdx.yaml",
+    ".spdx.yml",
+    ".spdx.rdf",
+    ".jsonld",
+    ".cdx.json",
+    ".bom.json",
+    ".json",
+    ".xml",
+)
+
+
+def _write_report(filename, audit):
+    try:
+        import orjson
+    except ImportError:
+        # Stream report to file rather than building it in memory
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(audit, f, indent=2)
+            f.write("\n")
+        return
+    # Faster serialisation if available
+    with open(filename, "wb") as f:
+        f.write(
+            orjson.dumps(audit, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+        )
+
+
+def output_report(filename, audit):
+    if filename != "":
+        try:
+            _write_report(filename, audit)
+            return
+        except FileNotFoundError:
+            # Unable to create file, so send output to console
+            pass
+    from lib4sbom.output import SBOMOutput
+
+    audit_out = SBOMOutput("", "json")
+    audit_out.generate_output(audit)
+
+
 # CLI processing
 
 
-def main(argv=None):
-    argv = argv or sys.argv
+@functools.lru_cache(maxsize=1)
+def _build_parser():
     app_name = "sbomaudit"
     parser = argparse.ArgumentParser(
         prog=app_name,
@@ -32,7 +76,7 @@ def main(argv=None):
         "--input-file",
         action="store",
         default="",
-        help="Name of SBOM file",
+        help="Name of SBOM file, directory of SBOM files or pattern of SBOM filenames",
     )
 
     input_group.add_argument(
@@ -42,6 +86,20 @@ def main(argv=None):
         default=False,
     )
 
+    input_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not use cached package version information",
+        default=False,
+    )
+
+    input_group.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="ignore and replace cached package version information",
+        default=False,
+    )
+
     input_group.add_argument(
         "--cpecheck",
         action="store_true",
@@ -63,9 +121,17 @@ def main(argv=None):
         default=False,
     )
 
+    input_group.add_argument(
+        "--ntia-only",
+        action="store_true",
+        help="only check for NTIA conformance",
+        default=False,
+    )
+
     input_group.add_argument(
         "--age",
         action="store",
+        type=int,
         help="minimum age of package (as integer representing days) to report (default: 0)",
         default=0,
     )
@@ -73,6 +139,7 @@ def main(argv=None):
     input_group.add_argument(
         "--maxage",
         action="store",
+        type=int,
         help="maximum age of package (as integer representing years) to report (default: 2)",
         default=2,
     )
@@ -90,6 +157,14 @@ def main(argv=None):
         help="Name of deny list file",
     )
 
+    input_group.add_argument(
+        "--jobs",
+        action="store",
+        type=int,
+        help="number of processes used to check files and packages (default: 1)",
+        default=1,
+    )
+
     input_group.add_argument(
         "--verbose",
         action="store_true",
@@ -105,6 +180,13 @@ def main(argv=None):
         help="add debug information",
     )
 
+    output_group.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="output audit report in JSON format",
+    )
+
     output_group.add_argument(
         "-o",
         "--output-file",
@@ -114,77 +196,149 @@ def main(argv=None):
     )
 
     parser.add_argument("-V", "--version", action="version", version=VERSION)
+    return parser
+
+
+def main(argv=None):
+    argv = argv or sys.argv
+    # Parser is only built once if called more than once
+    parser = _build_parser()
 
     defaults = {
         "input_file": "",
         "debug": False,
         "offline": False,
+        "no_cache": False,
+        "refresh_cache": False,
         "cpecheck": False,
         "purlcheck": False,
         "disable_license_check": False,
+        "ntia_only": False,
         "age": 0,
         "maxage": 2,
         "allow": "",
         "deny": "",
+        "jobs": 1,
         "verbose": False,
+        "json": False,
         "output_file": "",
     }
 
-    raw_args = parser.parse_args(argv[1:])
-    args = {key: value for key, value in vars(raw_args).items() if value}
-    args = ChainMap(args, defaults)
+    # Defaults are only overridden by values which have been specified
+    args = parser.parse_args(argv[1:], namespace=argparse.Namespace(**defaults))
 
     # Validate CLI parameters
 
-    input_file = args["input_file"]
+    input_file = args.input_file
 
     if input_file == "":
         print("[ERROR] SBOM name must be specified.")
         return -1
 
-    if args["debug"]:
-        print("Input file", args["input_file"])
-        print("Offline mode", args["offline"])
-        print("Verbose", args["verbose"])
-        print("CPE Check", args["cpecheck"])
-        print("PURL Check", args["purlcheck"])
-        print("SPDX License Check", not args["disable_license_check"])
-        print("Minimum package age", args["age"])
-        print("Maximum package age", args["maxage"])
-        print("Allow list file", args["allow"])
-        print("Deny list file", args["deny"])
-        print("Output file", args["output_file"])
+    if args.debug:
+        settings = [
+            ("Input file", args.input_file),
+            ("Offline mode", args.offline),
+            ("Use cache", not args.no_cache),
+            ("Refresh cache", args.refresh_cache),
+            ("Verbose", args.verbose),
+            ("CPE Check", args.cpecheck),
+            ("PURL Check", args.purlcheck),
+            ("SPDX License Check", not args.disable_license_check),
+            ("NTIA only", args.ntia_only),
+            ("Minimum package age", args.age),
+            ("Maximum package age", args.maxage),
+            ("Allow list file", args.allow),
+            ("Deny list file", args.deny),
+            ("Jobs", args.jobs),
+            ("JSON output", args.json),
+            ("Output file", args.output_file),
+        ]
+        # Report settings in a single write
+        sys.stdout.write("".join(f"{label} {value}\n" for label, value in settings))
 
     audit_options = {
-        "verbose": args["verbose"],
-        "offline": args["offline"],
-        "cpecheck": args["cpecheck"],
-        "purlcheck": args["purlcheck"],
-        "license_check": not args["disable_license_check"],
-        "age": args["age"],
-        "maxage": args["maxage"],
-        "debug": args["debug"],
+        "verbose": args.verbose,
+        "offline": args.offline,
+        "cache": not args.no_cache,
+        "refresh_cache": args.refresh_cache,
+        "cpecheck": args.cpecheck,
+        "purlcheck": args.purlcheck,
+        "license_check": not args.disable_license_check,
+        "ntia_only": args.ntia_only,
+        "age": args.age,
+        "maxage": args.maxage,
+        "debug": args.debug,
+        "json": args.json,
+        "jobs": args.jobs,
     }
 
-    sbom_parser = SBOMParser()
-    ntia_compliance = False
-    # Load SBOM - will autodetect SBOM type
-    try:
-        sbom_parser.parse_file(input_file)
+    # Only load the SBOM and audit modules once the arguments are validated
+    from lib4sbom.exception import SBOMParserException
+    from lib4sbom.parser import SBOMParser
+
+    from sbomaudit.audit import SBOMaudit
+
+    # Filenames may contain glob characters so check for a file first
+    if os.path.isfile(input_file):
+        input_files = [input_file]
+    elif os.path.isdir(input_file):
+        input_files = [
+            filename
+            for filename in sorted(glob.glob(os.path.join(input_file, "*")))
+            if filename.endswith(SBOM_EXTENSIONS) and os.path.isfile(filename)
+        ]
+    else:
+        input_files = [
+            filename
+            for filename in sorted(glob.glob(input_file))
+            if os.path.isfile(filename)
+        ]
+    if len(input_files) == 0:
+        print(f"{input_file} not found", file=sys.stderr)
+        return -1
 
-        sbom_audit = SBOMaudit(options=audit_options, output=args["output_file"])
-        if args["allow"]:
-            sbom_audit.process_file(args["allow"], allow=True)
-        if args["deny"]:
-            sbom_audit.process_file(args["deny"], allow=False)
-        ntia_compliance = sbom_audit.audit_sbom(sbom_parser)
+    # Audit is only set up once for all of the SBOMs
+    sbom_audit = SBOMaudit(options=audit_options, output=args.output_file)
+    if args.allow:
+        sbom_audit.process_file(args.allow, allow=True)
+    if args.deny:
+        sbom_audit.process_file(args.deny, allow=False)
 
-        if args["output_file"] != "":
-            audit_out = SBOMOutput(args["output_file"], "json")
-            audit_out.generate_output(sbom_audit.get_audit())
+    ntia_compliance = True
+    reports = {}
+    for filename in input_files:
+        if len(input_files) > 1 and sbom_audit.console_out:
+            print(f"SBOM {filename}")
+        # Load SBOM - will autodetect SBOM type
+        sbom_parser = SBOMParser()
+        try:
+            sbom_parser.parse_file(filename)
+        except (FileNotFoundError, SBOMParserException):
+            # FileNotFoundError is also raised for empty files
+            if not os.path.isfile(filename):
+                print(f"{filename} not found", file=sys.stderr)
+            elif os.path.getsize(filename) == 0:
+                print(f"{filename} is empty", file=sys.stderr)
+            else:
+                print(f"{filename} is not a valid SBOM", file=sys.stderr)
+            if len(input_files) == 1:
+                return -1
+            ntia_compliance = False
+            continue
+        sbom_audit.reset()
+        # All SBOMs must be compliant
+        ntia_compliance = sbom_audit.audit_sbom(sbom_parser) and ntia_compliance
+        # SBOM is no longer required once audited
+        del sbom_parser
+        reports[filename] = sbom_audit.get_audit()
 
-    except FileNotFoundError:
-        print(f"{input_file} not found")
+    if args.output_file != "" or args.json:
+        # Reports for multiple SBOMs are identified by filename
+        output_report(
+            args.output_file,
+            reports if len(input_files) > 1 else reports[input_files[0]],
+        )
 
     # Return 0 for False, 1 for True
     return int(ntia_compliance)
@@ -1,6 +1,8 @@
 # Copyright (C) 2023 Anthony Harrison
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+
 from setuptools import find_packages, setup
 
 from sbomaudit.version import VERSION
@@ -25,6 +27,7 @@ setup_kwargs = dict(
     license='Apache-2.0',
     keywords=["audit", "quality", "tools", "SBOM", "DevSecOps", "SPDX", "CycloneDX"],
     install_requires=requirements,
+    extras_require={"orjson": ["orjson"]},
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
@@ -48,4 +51,12 @@ setup_kwargs = dict(
     },
 )
 
+if os.environ.get("SBOMAUDIT_USE_MYPYC", None) == "1":
+    # Optionally compile the audit module with mypyc for faster audits
+    from mypyc.build import mypycify
+
+    setup_kwargs["ext_modules"] = mypycify(
+        ["--ignore-missing-imports", "sbomaudit/audit.py"]
+    )
+
 setup(**setup_kwargs)